@@ -2,33 +2,252 @@ import os
 import sys
 import blake3
 import hashlib
+import mmap
 import time
 import re
+import shutil
+import sqlite3
+import queue
+import threading
+import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
 
-def get_file_hash(file_path, algorithm):
-    """Вычисляет хэш файла с использованием указанного алгоритма."""
-    if algorithm == 'sha256':
-        hash_algorithm = hashlib.sha256()
-    elif algorithm == 'blake3':
-        hash_algorithm = blake3.blake3()
-    else:
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick необязателен: без него литералы проверяются регулярным выражением
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+# Размер блока чтения при хэшировании: крупные блоки уменьшают число
+# системных вызовов и итераций цикла на Python
+HASH_BLOCK_SIZE = 1 << 20
+
+# Хэш нужен только для проверки на совпадение, для этого достаточно 128 бит
+HASH_DIGEST_SIZE = 16
+
+# Расположение кэша хэшей по умолчанию
+HASH_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'rollings', 'hashes.sqlite')
+
+# Файлы больше этого размера хэшируются через mmap
+MMAP_MIN_SIZE = 64 * 1024
+
+# Сколько блоков хэширования сразу ставится в очередь чтения при открытии файла
+READAHEAD_BLOCKS = 16
+
+def _advise_sequential_read(f, hash_block_size):
+    """Подсказывает ядру, что файл будет прочитан последовательно от начала до конца."""
+    # Первые READAHEAD_BLOCKS блоков сразу ставятся в очередь чтения, чтобы устройство обрабатывало несколько запросов одновременно
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(f.fileno(), 0, READAHEAD_BLOCKS * hash_block_size, os.POSIX_FADV_WILLNEED)
+
+def make_hasher(algorithm, hash_block_size=HASH_BLOCK_SIZE):
+    """Возвращает функцию, вычисляющую хэш файла выбранным алгоритмом."""
+    # Алгоритм не меняется в течение запуска, поэтому реализация выбирается один раз,
+    # а нужные функции заранее сохраняются в локальных переменных замыкания
+    digest_size = HASH_DIGEST_SIZE
+
+    if algorithm == 'blake3':
+        new_hash = blake3.blake3
+        max_threads = blake3.blake3.AUTO
+
+        def hash_file(file_path):
+            # BLAKE3 сам открывает файл, отображает его в память и хэширует
+            # в нескольких потоках с SIMD. posix_fadvise действует только на свой
+            # дескриптор и на это отображение не влияет, поэтому файл заранее не открываем
+            hash_algorithm = new_hash(max_threads=max_threads)
+            hash_algorithm.update_mmap(file_path)
+            return hash_algorithm.digest()[:digest_size]
+
+        return hash_file
+
+    if algorithm != 'sha256':
         raise ValueError(f"Unsupported algorithm: {algorithm}")
 
-    with open(file_path, 'rb') as f:
-        while chunk := f.read(4096):
-            hash_algorithm.update(chunk)
+    new_hash = hashlib.sha256
+    advise = _advise_sequential_read
+    fstat = os.fstat
+    # В Python 3.11+ цикл чтения выполняет hashlib.file_digest без лишних копий
+    file_digest = getattr(hashlib, 'file_digest', None)
+    madvise_sequential = getattr(mmap, 'MADV_SEQUENTIAL', None)
+
+    def hash_file(file_path):
+        with open(file_path, 'rb') as f:
+            advise(f, hash_block_size)
+
+            # Крупные файлы хэшируются прямо из страничного кэша через mmap,
+            # без копирования каждого блока в новый объект bytes
+            if fstat(f.fileno()).st_size > MMAP_MIN_SIZE:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    if madvise_sequential is not None:
+                        mapped.madvise(madvise_sequential)
+                    return new_hash(mapped).digest()[:digest_size]
+
+            if file_digest is not None:
+                return file_digest(f, new_hash).digest()[:digest_size]
+
+            hash_algorithm = new_hash()
+            read = f.read
+            update = hash_algorithm.update
+            while chunk := read(hash_block_size):
+                update(chunk)
+        return hash_algorithm.digest()[:digest_size]
+
+    return hash_file
+
+def get_file_hash(file_path, algorithm, hash_block_size=HASH_BLOCK_SIZE):
+    """Вычисляет хэш файла с использованием указанного алгоритма."""
+    return make_hasher(algorithm, hash_block_size)(file_path)
+
+class HashCache:
+    """Постоянный кэш хэшей файлов между запусками."""
+
+    # Количество записей, сохраняемых в одной транзакции, и наибольшая задержка записи в секундах
+    BATCH_SIZE = 1000
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path, algorithm, hash_file):
+        self._algorithm = algorithm
+        self._hash_file = hash_file
+        # Соединение используется из нескольких потоков, доступ защищен блокировкой
+        self._lock = threading.Lock()
+        self._pending_rows = []
+        self._last_flush = time.monotonic()
+        self._connection = None
+
+        # Кэш только ускоряет работу: если базу нельзя открыть, хэшируем без него
+        connection = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                "dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, ctime_ns INTEGER, hash BLOB, algo TEXT, "
+                "PRIMARY KEY (dev, ino, algo))"
+            )
+            connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Кэш хэшей недоступен: %s (%s)", path, e)
+            if connection is not None:
+                connection.close()
+            return
+        self._connection = connection
+
+    def get_file_hash(self, file_path, stat_info):
+        """Возвращает хэш файла из кэша или вычисляет его и сохраняет в кэш."""
+        # Файлы без номера inode по нему не найти, такие файлы не кэшируем
+        if self._connection is None or not stat_info.st_ino:
+            return self._hash_file(file_path)
+
+        key = (stat_info.st_dev, stat_info.st_ino, self._algorithm)
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT size, mtime_ns, ctime_ns, hash FROM hashes WHERE dev = ? AND ino = ? AND algo = ?", key
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.debug("Не удалось прочитать кэш хэшей: %s", e)
+            row = None
+        # Запись действительна, пока не изменились размер, mtime и ctime. В POSIX ctime нельзя
+        # выставить вручную, поэтому перезапись с восстановленным mtime тоже заметна
+        if row is not None and row[:3] == (stat_info.st_size, stat_info.st_mtime_ns, stat_info.st_ctime_ns):
+            # Записи с полным дайджестом, сохраненные раньше, укорачиваются до того же размера
+            return row[3][:HASH_DIGEST_SIZE]
+
+        file_hash = self._hash_file(file_path)
+        with self._lock:
+            self._pending_rows.append((stat_info.st_dev, stat_info.st_ino, stat_info.st_size, stat_info.st_mtime_ns,
+                                       stat_info.st_ctime_ns, file_hash, self._algorithm))
+            if len(self._pending_rows) >= self.BATCH_SIZE or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+                self._flush()
+        return file_hash
+
+    def _flush(self):
+        """Записывает накопленные записи одной короткой транзакцией (вызывается под блокировкой)."""
+        # Транзакция не держится открытой, пока хэшируются файлы, чтобы не мешать другим запускам
+        rows, self._pending_rows = self._pending_rows, []
+        self._last_flush = time.monotonic()
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO hashes (dev, ino, size, mtime_ns, ctime_ns, hash, algo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+        except sqlite3.Error as e:
+            logger.warning("Не удалось сохранить кэш хэшей: %s", e)
+
+    def close(self):
+        """Сохраняет оставшиеся записи и закрывает базу."""
+        if self._connection is None:
+            return
+        with self._lock:
+            if self._pending_rows:
+                self._flush()
+            self._connection.close()
 
-    return hash_algorithm.hexdigest()
+def _copy_data(src_fd, dst_fd, size):
+    """Копирует содержимое одного открытого файла в другой, по возможности не выходя из ядра."""
+    # copy_file_range копирует данные внутри ядра, а на XFS/Btrfs/ZFS
+    # создает reflink без физического копирования блоков
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            # Файловая система не поддерживает copy_file_range (например, копирование между устройствами)
+            if copied:
+                raise
+        if copied:
+            return
 
-def copy_file(source_file, dest_file, block_size):
-    """Копирует файл с указанным размером блока и сохраняет метаданные."""
-    with open(source_file, 'rb') as src, open(dest_file, 'wb') as dst:
-        while chunk := src.read(block_size):
-            dst.write(chunk)
+    # sendfile в Linux тоже передает данные внутри ядра
+    if sys.platform.startswith('linux'):
+        try:
+            while copied < size:
+                sent = os.sendfile(dst_fd, src_fd, None, size - copied)
+                if sent == 0:
+                    break
+                copied += sent
+        except OSError:
+            if copied:
+                raise
+        if copied:
+            return
 
-    # Копируем метаданные времени
-    stat_info = os.stat(source_file)
-    os.utime(dest_file, (stat_info.st_atime, stat_info.st_mtime))
+    # На остальных системах копируем через буфер shutil.COPY_BUFSIZE
+    with open(src_fd, 'rb', closefd=False) as src, open(dst_fd, 'wb', closefd=False) as dst:
+        shutil.copyfileobj(src, dst)
+
+def copy_file(source_entry, dest_file):
+    """Копирует файл средствами ядра, без прохода данных через Python, и сохраняет метаданные."""
+    binary_flag = getattr(os, 'O_BINARY', 0)
+    src_fd = os.open(source_entry.path, os.O_RDONLY | binary_flag)
+    try:
+        # Размер и время берутся у открытого дескриптора, а не из DirEntry: файл мог измениться, пока ждал в очереди
+        stat_info = os.fstat(src_fd)
+        dst_fd = os.open(dest_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | binary_flag, 0o666)
+        try:
+            _copy_data(src_fd, dst_fd, stat_info.st_size)
+
+            # Копируем метаданные времени с точностью до наносекунд (futimens)
+            if os.utime in os.supports_fd:
+                os.utime(dst_fd, ns=(stat_info.st_atime_ns, stat_info.st_mtime_ns))
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+    # В Windows время нельзя выставить через дескриптор, используем путь
+    if os.utime not in os.supports_fd:
+        os.utime(dest_file, ns=(stat_info.st_atime_ns, stat_info.st_mtime_ns))
 
     try:
         os.setctime(dest_file, stat_info.st_ctime)
@@ -46,11 +265,127 @@ def copy_directory_metadata(source_dir, dest_dir):
     except AttributeError:
         pass
 
-def should_exclude(path, exclude_patterns):
-    """Проверяет, нужно ли исключить файл или каталог на основе заданных шаблонов."""
-    return any(re.search(pattern, path) for pattern in exclude_patterns)
+def compile_exclude_patterns(exclude_patterns):
+    """Готовит шаблоны исключения к быстрой проверке путей: возвращает пару (автомат или None, список выражений)."""
+    # Шаблоны без спецсимволов ищутся как подстроки автоматом Ахо-Корасик (если установлен pyahocorasick)
+    # за один проход по пути, остальные по возможности объединяются в одно регулярное выражение
+    literals = []
+    regexes = []
+    for pattern in exclude_patterns:
+        if ahocorasick is not None and pattern and re.escape(pattern) == pattern:
+            literals.append(pattern)
+        else:
+            regexes.append(pattern)
+
+    automaton = None
+    if literals:
+        automaton = ahocorasick.Automaton()
+        for index, literal in enumerate(literals):
+            automaton.add_word(literal, index)
+        automaton.make_automaton()
+
+    # Каждый шаблон компилируется отдельно, чтобы ошибки указывали на конкретный шаблон
+    compiled = [re.compile(pattern) for pattern in regexes]
+    # Объединение меняет смысл шаблонов с группами и обратными ссылками, а глобальный
+    # флаг вроде (?i) в Python < 3.11 распространился бы на все шаблоны сразу
+    default_flags = re.compile('').flags
+    if len(compiled) > 1 and all(not regex.groups and regex.flags == default_flags for regex in compiled):
+        try:
+            compiled = [re.compile("|".join(f"(?:{pattern})" for pattern in regexes))]
+        except re.error:
+            pass
+    return automaton, compiled
+
+def should_exclude(path, exclude):
+    """Проверяет, нужно ли исключить файл или каталог по шаблонам из compile_exclude_patterns."""
+    automaton, regexes = exclude
+    if automaton is not None and next(automaton.iter(path), None) is not None:
+        return True
+    return any(regex.search(path) is not None for regex in regexes)
+
+def _walk(path, exclude, rel_path=''):
+    """Рекурсивно обходит каталог через os.scandir и выдает пары (DirEntry, относительный путь)."""
+    # Читаем каталог целиком, чтобы не держать открытые дескрипторы во время рекурсии.
+    # Недоступные каталоги (например, System Volume Information) пропускаются, как в os.walk
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError as e:
+        logger.warning("Пропускаем недоступный каталог: %s (%s)", path, e)
+        return
+
+    for entry in entries:
+        entry_rel_path = os.path.join(rel_path, entry.name)
+        if entry.is_dir():
+            # Как и os.walk, не заходим в символические ссылки на каталоги
+            if entry.is_symlink():
+                continue
+            if should_exclude(entry.path, exclude):
+                logger.debug("Пропускаем файл/каталог: %s (по исключению)", entry.path)
+                continue
+            # Каталог выдается раньше своего содержимого
+            yield entry, entry_rel_path
+            yield from _walk(entry.path, exclude, entry_rel_path)
+        else:
+            yield entry, entry_rel_path
+
+def _file_hash(file_path, stat_info, hash_file, hash_cache=None):
+    """Вычисляет хэш файла, используя кэш, если он задан."""
+    if hash_cache is not None:
+        return hash_cache.get_file_hash(file_path, stat_info)
+    return hash_file(file_path)
+
+def _process_file(entry, dest_file, hash_file, hash_cache=None, quick_check=True, hash_executor=None):
+    """Сравнивает файл с копией в целевом каталоге, копирует его при отличии и возвращает True, если скопировал."""
+    source_file = entry.path
 
-def backup_files(source_dir, dest_dir, algorithm, block_size, exclude_patterns):
+    # Копируем файл, если его нет в целевом каталоге; один stat вместо exists + stat
+    try:
+        dest_stat = os.stat(dest_file)
+    except OSError:
+        logger.info("Копируем файл: %s -> %s", source_file, dest_file)
+        copy_file(entry, dest_file)
+        return True
+
+    # Быстрая проверка как в rsync: если размер и время модификации
+    # совпадают, файл считается неизменным и не хэшируется.
+    # Атрибуты источника уже получены при чтении каталога
+    source_stat = entry.stat()
+    # Разный размер уже доказывает, что файлы отличаются: хэшировать нечего
+    if source_stat.st_size != dest_stat.st_size:
+        logger.info("Копируем файл: %s -> %s", source_file, dest_file)
+        copy_file(entry, dest_file)
+        return True
+
+    if quick_check and int(source_stat.st_mtime) == int(dest_stat.st_mtime):
+        logger.debug("Файл не изменился: %s (размер и время совпадают)", source_file)
+        return False
+
+    # Хэш источника вычисляется один раз; неизменные с прошлого запуска файлы берутся из кэша.
+    # Копия хэшируется в отдельном потоке одновременно с источником: файлы
+    # обычно лежат на разных устройствах, и их чтение перекрывается
+    if hash_executor is not None:
+        dest_future = hash_executor.submit(_file_hash, dest_file, dest_stat, hash_file, hash_cache)
+        source_hash = _file_hash(source_file, source_stat, hash_file, hash_cache)
+        dest_hash = dest_future.result()
+    else:
+        source_hash = _file_hash(source_file, source_stat, hash_file, hash_cache)
+        dest_hash = _file_hash(dest_file, dest_stat, hash_file, hash_cache)
+    if dest_hash != source_hash:
+        logger.info("Копируем файл: %s -> %s", source_file, dest_file)
+        copy_file(entry, dest_file)
+        return True
+
+    logger.debug("Файл не изменился: %s (хэш совпадает)", source_file)
+    # Как rsync, переносим время источника на копию, чтобы в следующий раз сработала быстрая проверка
+    if source_stat.st_mtime_ns != dest_stat.st_mtime_ns:
+        try:
+            os.utime(dest_file, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        except OSError as e:
+            logger.warning("Не удалось установить время файла %s: %s", dest_file, e)
+    return False
+
+def backup_files(source_dir, dest_dir, algorithm, exclude, hash_block_size=HASH_BLOCK_SIZE, hash_cache_path=HASH_CACHE_PATH, quick_check=True):
     """Копирует файлы и метаданные с одного устройства на другое, исключая указанные файлы."""
     # Преобразуем пути в абсолютные
     source_dir = os.path.abspath(source_dir)
@@ -58,81 +393,174 @@ def backup_files(source_dir, dest_dir, algorithm, block_size, exclude_patterns):
 
     # Проверяем, что исходный каталог существует и является директорией
     if not os.path.exists(source_dir) or not os.path.isdir(source_dir):
-        print(f"Исходный каталог не существует или не является директорией: {source_dir}")
+        logger.error("Исходный каталог не существует или не является директорией: %s", source_dir)
         return
 
     # Создаем целевой каталог, если он не существует
     if not os.path.exists(dest_dir):
-        print(f"Целевой каталог не существует: {dest_dir}. Создание каталога.")
+        logger.info("Целевой каталог не существует: %s. Создание каталога.", dest_dir)
         os.makedirs(dest_dir)
         copy_directory_metadata(source_dir, dest_dir)
 
     total_files = 0
-    copied_files = 0
+    workers = os.cpu_count() or 1
+    # Ограниченная очередь: обход каталогов опережает обработку не более чем на 1024 файла
+    file_queue = queue.Queue(maxsize=1024)
+    producer_errors = []
+    # Устанавливается при ошибке обработчика, чтобы обход и остальные обработчики остановились
+    stop = threading.Event()
+    # Реализация хэширования выбирается один раз за запуск
+    hash_file = make_hasher(algorithm, hash_block_size)
+    # В Windows нет времени изменения inode, без него записи кэша нельзя надежно проверить
+    use_cache = hash_cache_path and sys.platform != 'win32'
+    hash_cache = HashCache(hash_cache_path, algorithm, hash_file) if use_cache else None
     start_time = time.time()
 
-    print(f"Начало архивного копирования с устройства: {source_dir}")
+    logger.info("Начало архивного копирования с устройства: %s", source_dir)
 
-    # Проход по всем подкаталогам и файлам в исходном каталоге
-    for dirpath, dirnames, filenames in os.walk(source_dir):
-        rel_dirpath = os.path.relpath(dirpath, source_dir)
-        target_dirpath = os.path.join(dest_dir, rel_dirpath)
+    def put(item):
+        """Ставит элемент в очередь; возвращает False, если обработка остановлена."""
+        while not stop.is_set():
+            try:
+                file_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
 
-        # Создаем каталог в целевом месте, если он еще не существует
-        if not os.path.exists(target_dirpath):
-            os.makedirs(target_dirpath)
-            copy_directory_metadata(dirpath, target_dirpath)
+    def get():
+        """Берет элемент из очереди; возвращает None, если обработка остановлена."""
+        while not stop.is_set():
+            try:
+                return file_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
 
-        # Копируем файлы из текущего каталога
-        for filename in filenames:
-            total_files += 1
-            source_file = os.path.join(dirpath, filename)
-            dest_file = os.path.join(dest_dir, os.path.relpath(source_file, source_dir))
+    def produce():
+        """Обходит исходный каталог и ставит файлы в очередь на обработку."""
+        nonlocal total_files
+        try:
+            # Проход по всем подкаталогам и файлам в исходном каталоге
+            for entry, rel_path in _walk(source_dir, exclude):
+                target_path = os.path.join(dest_dir, rel_path)
 
-            # Пропускаем файлы, которые соответствуют шаблонам исключения
-            if should_exclude(source_file, exclude_patterns):
-                print(f"Пропускаем файл/каталог: {source_file} (по исключению)")
-                continue
+                # Создаем каталог в целевом месте, если он еще не существует
+                if entry.is_dir():
+                    if not os.path.exists(target_path):
+                        os.makedirs(target_path)
+                        copy_directory_metadata(entry.path, target_path)
+                    continue
 
-            # Создаем каталог для файла, если его еще нет
-            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+                # Пропускаем файлы, которые соответствуют шаблонам исключения
+                if should_exclude(entry.path, exclude):
+                    logger.debug("Пропускаем файл/каталог: %s (по исключению)", entry.path)
+                    continue
 
-            # Копируем файл, если его нет в целевом каталоге или он отличается
-            if not os.path.exists(dest_file) or get_file_hash(dest_file, algorithm) != get_file_hash(source_file, algorithm):
-                print(f"Копируем файл: {source_file} -> {dest_file}")
-                copy_file(source_file, dest_file, block_size)
-                copied_files += 1
-            else:
-                print(f"Файл не изменился: {source_file} (хэш совпадает)")
+                total_files += 1
+
+                if not put((entry, target_path)):
+                    break
+        except Exception as e:
+            producer_errors.append(e)
+        finally:
+            # По одному маркеру завершения на каждый обработчик
+            for _ in range(workers):
+                put(None)
+
+    def consume():
+        """Обрабатывает файлы из очереди и возвращает число скопированных."""
+        copied = 0
+        try:
+            while (item := get()) is not None:
+                entry, dest_file = item
+                if _process_file(entry, dest_file, hash_file, hash_cache, quick_check, hash_executor):
+                    copied += 1
+        except BaseException:
+            stop.set()
+            raise
+        return copied
+
+    # Обход каталогов идет в отдельном потоке параллельно с хэшированием и копированием
+    producer = threading.Thread(target=produce)
+    producer.start()
+    try:
+        # Хэши копий считаются в отдельном пуле: его задачи ничего не ждут,
+        # поэтому обработчики из основного пула не могут заблокировать друг друга
+        with ThreadPoolExecutor(max_workers=workers) as executor, ThreadPoolExecutor(max_workers=workers) as hash_executor:
+            futures = [executor.submit(consume) for _ in range(workers)]
+            try:
+                copied_files = sum(future.result() for future in futures)
+            except BaseException:
+                # Останавливаем обход и обработчики до того, как пулы начнут их ждать (например, по Ctrl+C)
+                stop.set()
+                raise
+    finally:
+        # Если обработчики завершились с ошибкой, обход не должен остаться ждать места в очереди
+        stop.set()
+        producer.join()
+        if hash_cache is not None:
+            hash_cache.close()
+    if producer_errors:
+        raise producer_errors[0]
 
     end_time = time.time()
     total_duration = end_time - start_time
-    print(f"Архивное копирование завершено. Обработано файлов: {copied_files}/{total_files}. Время: {total_duration:.2f} секунд.")
+    logger.info("Архивное копирование завершено. Обработано файлов: %d/%d. Время: %.2f секунд.",
+                copied_files, total_files, total_duration)
 
 if __name__ == "__main__":
     # Проверяем правильность аргументов командной строки
     if len(sys.argv) < 3:
-        print("Использование: python backup.py <источник> <пункт назначения> [--algorithm sha256|blake3] [--block-size размер_в_байтах] [--exclude regex_pattern ...]")
+        print("Использование: python backup.py <источник> <пункт назначения> [--algorithm blake3|sha256] [--hash-block-size размер_в_байтах] [--no-cache] [--quick-check|--checksum] [--verbose|--debug] [--exclude regex_pattern ...]")
         sys.exit(1)
 
     source_directory = sys.argv[1].strip('"')
     destination_directory = sys.argv[2].strip('"')
-    algorithm = 'sha256'
-    block_size = 4096
+    algorithm = 'blake3'
+    hash_block_size = HASH_BLOCK_SIZE
+    hash_cache_path = HASH_CACHE_PATH
+    quick_check = True
+    log_level = logging.WARNING
     exclude_patterns = []
 
     # Обрабатываем опции командной строки
     for i in range(3, len(sys.argv)):
         if sys.argv[i] == '--algorithm':
             algorithm = sys.argv[i + 1]
-        elif sys.argv[i] == '--block-size':
-            block_size = int(sys.argv[i + 1])
+        elif sys.argv[i] == '--hash-block-size':
+            hash_block_size = int(sys.argv[i + 1])
+        elif sys.argv[i] == '--no-cache':
+            hash_cache_path = None
+        elif sys.argv[i] == '--quick-check':
+            quick_check = True
+        elif sys.argv[i] == '--checksum':
+            # Сравнивать по хэшу все существующие файлы, как rsync --checksum
+            quick_check = False
+        elif sys.argv[i] == '--verbose':
+            log_level = logging.INFO
+        elif sys.argv[i] == '--debug':
+            log_level = logging.DEBUG
         elif sys.argv[i] == '--exclude':
             exclude_patterns = sys.argv[i + 1:]
 
-    print(f"Исходный каталог: {source_directory}")
-    print(f"Целевой каталог: {destination_directory}")
-    print(f"Исключения: {exclude_patterns}")
+    # Рабочие потоки только кладут записи в очередь, а вывод в консоль
+    # выполняет отдельный поток, чтобы печать не тормозила копирование
+    log_queue = queue.SimpleQueue()
+    log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=log_level, format="%(message)s", handlers=[logging.handlers.QueueHandler(log_queue)])
+    log_listener.start()
+
+    logger.info("Исходный каталог: %s", source_directory)
+    logger.info("Целевой каталог: %s", destination_directory)
+    logger.info("Исключения: %s", exclude_patterns)
+
+    # Шаблоны исключения компилируются один раз, чтобы проверять путь
+    # одним проходом вместо вызова на каждый шаблон
+    exclude = compile_exclude_patterns(exclude_patterns)
 
     # Запускаем процесс архивного копирования
-    backup_files(source_directory, destination_directory, algorithm, block_size, exclude_patterns)
\ No newline at end of file
+    try:
+        backup_files(source_directory, destination_directory, algorithm, exclude, hash_block_size, hash_cache_path, quick_check)
+    finally:
+        log_listener.stop()
\ No newline at end of file
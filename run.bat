@@ -1,3 +1,3 @@
-python rolling's.py "D:\\" "E:\\" --exclude ".*\.tmp" --algorithm blake3 --block-size 4096"
+python rolling's.py "D:\\" "E:\\" --verbose --exclude ".*\.tmp" --algorithm blake3"
 
 pause